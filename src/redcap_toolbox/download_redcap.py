@@ -21,9 +21,13 @@ Options:
 
 import logging
 import os
+import stat
+import tempfile
+from itertools import chain
 from pathlib import Path
 
 import redcap
+import requests
 from docopt import docopt
 
 logging.basicConfig(format="%(message)s")
@@ -34,24 +38,94 @@ API_URL = os.environ["REDCAP_API_URL"]
 API_TOK = os.environ["REDCAP_API_TOKEN"]
 PROJ = redcap.Project(API_URL, API_TOK)
 
+CHUNK_SIZE = 1 << 20
+# Seconds to wait for a connection, and then between bytes of the response;
+# REDCap can take a while to build a big export before it sends anything
+TIMEOUT = (30, 600)
+
 
 def file_to_list(filename):
-    out = []
     with open(filename) as f:
-        out = [line.strip() for line in f.readlines()]
-    return out
+        return [s for s in (line.strip() for line in f) if s]
+
+
+def export_records_payload(forms, export_survey_fields):
+    """
+    Builds the same payload PROJ.export_records(format_type="csv", ...) sends,
+    so we can stream the response ourselves instead of getting it back as one
+    giant string.
+    """
+    payload = {
+        "token": API_TOK,
+        "content": "record",
+        "format": "csv",
+        "type": "flat",
+        # PyCap's export_records defaults
+        "rawOrLabel": "raw",
+        "rawOrLabelHeaders": "raw",
+        "eventName": "label",
+    }
+    if forms:
+        # Like PyCap, ask for the record ID and form_complete fields explicitly;
+        # REDCap leaves the record ID out if it's not on a requested form.
+        fields = [f"{form}_complete" for form in forms] + [PROJ.def_field]
+        payload.update({f"fields[{i}]": field for i, field in enumerate(fields)})
+        payload.update({f"forms[{i}]": form for i, form in enumerate(forms)})
+    if export_survey_fields:
+        payload["exportSurveyFields"] = export_survey_fields
+    return payload
+
+
+def output_mode(out_file):
+    """
+    The permissions open() would leave out_file with: its current mode if it
+    exists, otherwise the default for a new file under the current umask.
+    """
+    try:
+        return stat.S_IMODE(os.stat(out_file).st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def write_atomically(out_file, chunks):
+    """
+    Writes chunks to a temporary file next to out_file, then renames it into
+    place, so a failed download never leaves a truncated out_file behind.
+    """
+    out_file = Path(out_file)
+    with tempfile.NamedTemporaryFile(
+        dir=out_file.parent, prefix=f".{out_file.name}.", delete=False
+    ) as f:
+        try:
+            for chunk in chunks:
+                f.write(chunk)
+        except BaseException:
+            f.close()
+            os.unlink(f.name)
+            raise
+    # NamedTemporaryFile creates its file 0600; don't let that replace the
+    # permissions of the output file
+    os.chmod(f.name, output_mode(out_file))
+    os.replace(f.name, out_file)
 
 
 def download_redcap(out_file, form_list_file, export_survey_fields):
     forms = None
     if form_list_file:
         forms = file_to_list(form_list_file)
-    logger.debug(f"Instruments: {forms}")
-    data = PROJ.export_records(
-        format_type="csv", forms=forms, export_survey_fields=export_survey_fields
-    )
-    with open(out_file, "w", encoding="utf8") as f:
-        f.write(data)
+    logger.debug("Instruments: %s", forms)
+    payload = export_records_payload(forms, export_survey_fields)
+    with requests.post(API_URL, data=payload, stream=True, timeout=TIMEOUT) as response:
+        chunks = response.iter_content(chunk_size=CHUNK_SIZE)
+        first = next(chunks, b"")
+        # Like PyCap, treat a body starting with "ERROR:" as a failed request;
+        # REDCap sends these for things like a bad token or unknown form name
+        if first.lower().startswith(b"error:"):
+            raise redcap.RedcapError(first.decode(errors="replace").strip())
+        response.raise_for_status()
+        write_atomically(out_file, chain([first], chunks))
 
 
 def main():
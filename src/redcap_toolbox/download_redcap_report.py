@@ -24,17 +24,21 @@ Options:
   --file=<file>        A file containing a list of report IDs, one per line
   --id=<id>            A list of report IDs separated by commas
   --prefix=<prefix>    A filename prefix for the output [default: redcap]
+  --workers=<n>        Number of reports to download at once [default: 8]
 
 """
 
 import logging
 import os
 import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+from typing import Union
 
 import redcap
 from docopt import docopt
-from requests import RequestException
+
+from redcap_toolbox.options import positive_int
 
 logging.basicConfig(format="%(message)s")
 logger = logging.getLogger(__name__)
@@ -46,29 +50,47 @@ PROJ = redcap.Project(API_URL, API_TOK)
 
 
 def file_to_list(filename):
-    out = []
     with open(filename) as f:
-        out = [line.strip() for line in f.readlines()]
-    out = [str(rep_id) for rep_id in out if rep_id != ""]
-    return out
+        return [s for s in (line.strip() for line in f) if s]
+
+
+def download_one_report(rep_id: str, out_dir: Path, prefix: str, verbose: bool) -> None:
+    logger.debug("Downloading report for record ID: %s", rep_id)
+    try:
+        data = PROJ.export_report(report_id=rep_id, format_type="csv")
+        out_file = Path(out_dir).joinpath(f"{prefix}__report_{rep_id}.csv")
+        if isinstance(data, str):
+            data = data.encode("utf8")
+        with open(out_file, "wb") as f:
+            f.write(data)
+            logger.info(f"Report {rep_id} downloaded to {out_file}")
+    except redcap.RedcapError as e:
+        # PyCap raises RedcapError for an "ERROR:" response, such as an unknown
+        # report ID; it's an alias of requests' RequestException, so network
+        # failures land here too
+        logger.warning(e)
+        logger.warning(f"Report {rep_id} not found! Skipping ...")
+        if verbose:
+            logger.warning(traceback.format_exc())
 
 
 def download_redcap_report(
-    report_ids: list[str], out_dir: Path, prefix: str, verbose: bool
+    report_ids: list[str],
+    out_dir: Path,
+    prefix: str,
+    verbose: bool,
+    max_workers: Union[int, str] = 8,
 ) -> None:
-    for rep_id in report_ids:
-        logger.debug(f"Downloading report for record ID: {rep_id}")
-        try:
-            data = PROJ.export_report(report_id=rep_id, format_type="csv")
-            out_file = Path(out_dir).joinpath(f"{prefix}__report_{rep_id}.csv")
-            with open(out_file, "w", encoding="utf8") as f:
-                f.write(data)
-                logger.info(f"Report {rep_id} downloaded to {out_file}")
-        except RequestException as e:
-            logger.warning(e)
-            logger.warning(f"Report {rep_id} not found! Skipping ...")
-            if verbose:
-                logger.warning(traceback.format_exc())
+    max_workers = positive_int(max_workers, "Number of workers")
+    # Each report is a separate, network-bound request, so overlap them. The
+    # pool size also caps how many requests we have open against REDCap.
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(download_one_report, rep_id, out_dir, prefix, verbose)
+            for rep_id in report_ids
+        ]
+        for future in as_completed(futures):
+            future.result()
 
 
 def main():
@@ -90,13 +112,19 @@ def main():
         report_ids = [str(rep_id) for rep_id in args["--id"]]
     else:
         raise ValueError("No report IDs provided!")
-    logger.debug(f"Report IDs: {report_ids}")
+    logger.debug("Report IDs: %s", report_ids)
     if len(report_ids) == 0:
         raise ValueError(
             f"No report IDs provided! {report_ids}. Provide either --id or --file."
         )
 
-    download_redcap_report(report_ids, out_dir, args["--prefix"], args["--debug"])
+    download_redcap_report(
+        report_ids,
+        out_dir,
+        args["--prefix"],
+        args["--debug"],
+        args["--workers"],
+    )
 
 
 if __name__ == "__main__":
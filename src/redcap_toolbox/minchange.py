@@ -5,7 +5,8 @@ A function to return a dict with the minimal changes to transform
 one dataframe to another (identically-shaped) dataframe.
 """
 
-from collections.abc import Iterable
+from itertools import groupby
+from operator import itemgetter
 
 
 def transformation_dicts(source_df, target_df):
@@ -26,23 +27,44 @@ def transformation_dicts(source_df, target_df):
     }
     Rows that have no changes are not included.
     """
+    return list(iter_transformation_dicts(source_df, target_df))
+
+
+def iter_transformation_dicts(source_df, target_df):
+    """
+    Like transformation_dicts, but yields the dicts one at a time, so callers
+    that send them off in batches never need to hold the whole list. The frames
+    are checked right away, not on the first next().
+    """
     if not source_df.index.equals(target_df.index):
         raise ValueError("Source and target dfs have different indexes")
     if not source_df.columns.equals(target_df.columns):
         raise ValueError("Source and target dfs have different columns")
+    return _iter_changed_rows(source_df, target_df)
+
+
+def _iter_changed_rows(source_df, target_df):
     diff = source_df.ne(target_df)
-    return [
-        d for (idx, vals) in diff.iterrows() if (d := diff_dict(idx, vals, target_df))
-    ]
+    # Columns with no changes can't contribute to any dict; drop them up front,
+    # since updates usually only touch a few columns of a wide export
+    diff = diff.loc[:, diff.any()]
+    changed_cols = diff.columns
+    # Positions of every changed cell, in row-major order, and their new values
+    rows, cols = diff.to_numpy().nonzero()
+    values = target_df[changed_cols].to_numpy(dtype=object)[rows, cols]
+    # tolist() gives native Python labels; scalar lookups on a MultiIndex give
+    # numpy ints, which json.dumps (and so PyCap's import_records) rejects
+    labels = target_df.index[rows].tolist()
+    index_names = target_df.index.names
+    for _, cells in groupby(zip(rows, labels, cols, values), key=itemgetter(0)):
+        cells = list(cells)
+        yield index_dict(cells[0][1], index_names) | {
+            changed_cols[col]: value for (_, _, col, value) in cells
+        }
 
 
-def diff_dict(idx, vals, target_df):
-    if not isinstance(idx, Iterable) or isinstance(idx, str):
+def index_dict(idx, index_names):
+    # MultiIndex labels are tuples; anything else is a single label
+    if not isinstance(idx, tuple):
         idx = (idx,)
-    true_indexes = vals[vals].index
-    if len(true_indexes) == 0:
-        return None
-    return (
-        dict(zip(target_df.index.names, idx))
-        | target_df.loc[idx, true_indexes].to_dict()
-    )
+    return dict(zip(index_names, idx))
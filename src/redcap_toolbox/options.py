@@ -0,0 +1,19 @@
+#!/usr/bin/env python
+
+"""
+Helpers for checking the values of command-line options.
+"""
+
+
+def positive_int(value, name):
+    """
+    Returns value as an int, raising ValueError if it isn't a positive integer.
+    Accepts docopt's option strings as well as ints.
+    """
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a positive integer, not {value}") from None
+    if number < 1:
+        raise ValueError(f"{name} must be a positive integer, not {value}")
+    return number
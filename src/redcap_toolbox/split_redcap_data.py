@@ -25,6 +25,10 @@ scr__all_arm_1,scr
 pre__control_arm_1,pre
 pre__intervention_arm_1,pre
 
+Parquet output (--format=parquet or --format=both) is much faster to read back
+into pandas or polars than CSV, and needs the optional pyarrow dependency:
+pip install redcap-toolbox[parquet]
+
 Usage:
   split_redcap_data.py [options] <input_file> <output_directory>
 
@@ -32,10 +36,12 @@ Options:
   --event-map=<event_file>  A file mapping redcap events to file events
   --prefix=<prefix>         A filename prefix for the output [default: redcap]
   --no-condense             Don't filter empty rows, columns and files
+  --format=<format>         Output format: csv, parquet, or both [default: csv]
   -h --help                 Show this screen
   -d --debug                Print debugging output
 """
 
+import importlib.util
 import logging
 from collections import defaultdict
 from pathlib import Path
@@ -47,6 +53,14 @@ logging.basicConfig(format="%(message)s")
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+OUTPUT_EXTENSIONS = {"csv": ["csv"], "parquet": ["parquet"], "both": ["csv", "parquet"]}
+# The engines pandas' to_parquet will use, in the order it tries them
+PARQUET_ENGINES = ["pyarrow", "fastparquet"]
+
+
+def parquet_engine_available():
+    return any(importlib.util.find_spec(engine) for engine in PARQUET_ENGINES)
+
 
 def make_event_map(mapping_file):
     if mapping_file is None:
@@ -57,9 +71,14 @@ def make_event_map(mapping_file):
 
 
 def combine_names(event_name, rep_name):
-    parts = [name for name in [event_name, rep_name] if name != ""]
-    joined = "__".join(parts)
-    logger.debug(f"Made name {joined} from {event_name} and {rep_name}")
+    if not rep_name:
+        joined = event_name
+    elif not event_name:
+        joined = rep_name
+    else:
+        joined = f"{event_name}__{rep_name}"
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Made name %s from %s and %s", joined, event_name, rep_name)
     return joined
 
 
@@ -69,25 +88,29 @@ def split_data(data, event_map):
     """
     data_lists = defaultdict(list)
     index_col = data.columns[0]
-    event_groups = data.groupby(by="redcap_event_name")
-    for rc_event, event_data in event_groups:
+    groups = data.groupby(
+        by=["redcap_event_name", "redcap_repeat_instrument"], sort=False
+    )
+    for (rc_event, rep_group), rep_data in groups:
         out_event_name = event_map.get(rc_event, rc_event)
-        rep_groups = event_data.groupby(by="redcap_repeat_instrument")
-        for rep_group, rep_data in rep_groups:
-            out_name = combine_names(out_event_name, rep_group)
-            data_lists[out_name].append(rep_data)
-    # Now, we need to concat the dataframes and sort them by the index column
+        out_name = combine_names(out_event_name, rep_group)
+        data_lists[out_name].append(rep_data)
+    # The event map can send several events to the same file, so we need to
+    # concat the dataframes and sort them by the index column
     dataframes = {
         name: pd.concat(df_list).sort_values(by=index_col)
         for name, df_list in data_lists.items()
     }
     for name, df in dataframes.items():
-        logger.debug(f"Name: {name}, Shape: {df.shape})")
+        logger.debug("Name: %s, Shape: %s", name, df.shape)
     return dataframes
 
 
-def condense_df(df):
-    df = df.replace("", float("nan"))
+def condense_rowdrop_cols(df):
+    """
+    Returns the columns condense_df looks at to decide whether a row is empty.
+    Every split shares the input's columns, so this only needs working out once.
+    """
     index_col = df.columns[0]
     reserved_cols = {
         index_col,
@@ -95,17 +118,42 @@ def condense_df(df):
         "redcap_repeat_instrument",
         "redcap_repeat_instance",
     }
-    rowdrop_cols = set(df.columns) - reserved_cols
-    df.dropna(axis="index", how="all", subset=rowdrop_cols).dropna()
-    col_condensed = df.dropna(axis="columns", how="all")
+    return [col for col in df.columns if col not in reserved_cols]
+
+
+def condense_df(df, rowdrop_cols=None):
+    # One vectorized pass marks every empty cell; blank strings and NaN both
+    # count, and to_csv() writes either one out as an empty field.
+    empty = df.eq("") | df.isna()
+    if rowdrop_cols is None:
+        rowdrop_cols = condense_rowdrop_cols(df)
+    if rowdrop_cols:
+        has_data = ~empty[rowdrop_cols].all(axis="columns")
+        df, empty = df[has_data], empty[has_data]
+    col_condensed = df.loc[:, ~empty.all()]
     return col_condensed
 
 
 def split_redcap_data(
-    input_file, output_directory, prefix="redcap", mapping_file=None, condense=True
+    input_file,
+    output_directory,
+    prefix="redcap",
+    mapping_file=None,
+    condense=True,
+    output_format="csv",
 ):
+    if output_format not in OUTPUT_EXTENSIONS:
+        raise ValueError(
+            f"Unknown output format {output_format}! Use csv, parquet, or both."
+        )
+    # Check before reading anything, rather than failing after the first CSV
+    if "parquet" in OUTPUT_EXTENSIONS[output_format] and not parquet_engine_available():
+        raise ImportError(
+            "Parquet output needs pyarrow! Install it with "
+            "pip install redcap-toolbox[parquet]"
+        )
     event_map = make_event_map(mapping_file)
-    logger.debug(f"Event map: {event_map}")
+    logger.debug("Event map: %s", event_map)
     data = pd.read_csv(input_file, index_col=None, dtype=str, na_filter=False)
     # Make sure the event and repeating columns are present, so we can process
     # the data the same in all cases.
@@ -116,16 +164,25 @@ def split_redcap_data(
         data["redcap_repeat_instrument"] = ""
         data["redcap_repeat_instance"] = ""
         logger.debug("Non-repeating file, added repeat columns")
+    rowdrop_cols = condense_rowdrop_cols(data)
     named_dataframes = split_data(data, event_map)
     logger.debug(named_dataframes)
     for name, df in named_dataframes.items():
-        if condense:
-            df = condense_df(df)
         file_base = combine_names(prefix, name)
-        filename = f"{file_base}.csv"
-        out_path = Path(output_directory) / filename
-        logger.info(f"Saving dataframe with shape {df.shape} to {out_path}")
-        df.to_csv(out_path, index=False)
+        if condense:
+            df = condense_df(df, rowdrop_cols)
+            if df.empty:
+                # No row had data, so condense_df dropped every column too
+                logger.info(f"No data for {file_base}, skipping")
+                continue
+        for extension in OUTPUT_EXTENSIONS[output_format]:
+            filename = f"{file_base}.{extension}"
+            out_path = Path(output_directory) / filename
+            logger.info(f"Saving dataframe with shape {df.shape} to {out_path}")
+            if extension == "parquet":
+                df.to_parquet(out_path, compression="snappy", index=False)
+            else:
+                df.to_csv(out_path, index=False)
 
 
 def main():
@@ -139,6 +196,7 @@ def main():
         args["--prefix"],
         args["--event-map"],
         not args["--no-condense"],
+        args["--format"],
     )
 
 
@@ -8,22 +8,32 @@ Requires the following environment variables to be set:
 REDCAP_API_URL
 REDCAP_API_TOKEN
 
+Changes are imported in batches, several at a time. If a batch fails, no new
+batches are sent and the run exits with an error, but batches that had already
+gone through stay imported; the log shows the result of every batch.
+
 Usage: update_redcap_diff.py [options] <base_csv> <updated_csv>
 
 Options:
-    --dry-run     Don't actually make changes.
-    -h --help     Show this screen.
-    -v --verbose  Show debug logging.
+    --dry-run         Don't actually make changes.
+    --batch-size=<n>  Number of records to send per import [default: 500]
+    --workers=<n>     Number of imports to run at once [default: 4]
+    -h --help         Show this screen.
+    -v --verbose      Show debug logging.
 """
 
 import logging
+import math
 import os
 import sys
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import chain, islice
 
 import docopt
 import pandas as pd
 import redcap
 import redcap_toolbox.minchange
+from redcap_toolbox.options import positive_int
 
 logging.basicConfig(format="%(message)s")
 logger = logging.getLogger(__name__)
@@ -38,7 +48,58 @@ except KeyError:
 PROJ = redcap.Project(API_URL, API_TOK)
 
 
-def update_redcap_diff(base_csv, updated_csv, dry_run):
+def chunks(iterable, n):
+    """
+    Yields lists of up to n items from iterable, without materializing it. n must
+    be at least 1; update_redcap_diff checks the batch size before we get here.
+    """
+    it = iter(iterable)
+    return iter(lambda: list(islice(it, n)), [])
+
+
+def log_import_results(futures):
+    """
+    Logs the result of every import in futures, failed or not, and returns the
+    first failure (or None) so one bad batch doesn't hide the ones that worked.
+    """
+    error = None
+    for future in futures:
+        try:
+            logger.info(f"Import record result: {future.result()}")
+        except Exception as e:
+            logger.error(f"Import failed: {e}")
+            error = error or e
+    return error
+
+
+def import_batches(batches, max_workers):
+    # Keep a few imports in flight so we're not idle while REDCap processes
+    # each batch; the pool size caps the load we put on the server. We only
+    # pull the next batch once a slot is free, so at most max_workers batches
+    # are ever in memory.
+    error = None
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = set()
+        try:
+            for batch in batches:
+                if len(pending) >= max_workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    error = log_import_results(done)
+                    if error is not None:
+                        # Don't send anything new, but let in-flight imports finish
+                        break
+                logger.debug("Importing batch: %s", batch)
+                pending.add(executor.submit(PROJ.import_records, batch))
+        finally:
+            pending_error = log_import_results(pending)
+    error = error or pending_error
+    if error is not None:
+        raise error
+
+
+def update_redcap_diff(base_csv, updated_csv, dry_run, batch_size=500, max_workers=4):
+    batch_size = positive_int(batch_size, "Batch size")
+    max_workers = positive_int(max_workers, "Number of workers")
     base_df = pd.read_csv(
         base_csv, dtype=str, na_values=["nan", "NaN"], keep_default_na=False
     )
@@ -46,24 +107,32 @@ def update_redcap_diff(base_csv, updated_csv, dry_run):
     if "redcap_event_name" in base_df.columns:
         index_cols.append("redcap_event_name")
     base_df.set_index(index_cols, inplace=True)
-    logger.debug(f"Using index: {index_cols}")
+    logger.debug("Using index: %s", index_cols)
     updated_df = pd.read_csv(
         updated_csv, dtype=str, na_values=["nan", "NaN"], keep_default_na=False
     )
     updated_df.set_index(index_cols, inplace=True)
 
-    diffs = redcap_toolbox.minchange.transformation_dicts(base_df, updated_df)
-    if len(diffs) == 0:
+    diffs = redcap_toolbox.minchange.iter_transformation_dicts(base_df, updated_df)
+    first_diff = next(diffs, None)
+    if first_diff is None:
         logger.info("No changes to make")
         return
-    logger.debug(f"Diffs: {diffs}")
+    diffs = chain([first_diff], diffs)
 
     if dry_run:
         logger.warning("DRY RUN, NOT UPDATING ANYTHING")
-        logger.warning(f"First change would have been {diffs[0]}")
+        logger.warning(f"First change would have been {first_diff}")
+        record_count = 0
+        for diff in diffs:
+            logger.debug("Diff: %s", diff)
+            record_count += 1
+        batch_count = math.ceil(record_count / batch_size)
+        logger.warning(
+            f"Would have imported {record_count} records in {batch_count} batches"
+        )
     else:
-        result = PROJ.import_records(diffs)
-        logger.info(f"Import record result: {result}")
+        import_batches(chunks(diffs, batch_size), max_workers)
 
 
 def main():
@@ -71,7 +140,13 @@ def main():
     if args["--verbose"]:
         logger.setLevel(logging.DEBUG)
     logger.debug(args)
-    update_redcap_diff(args["<base_csv>"], args["<updated_csv>"], args["--dry-run"])
+    update_redcap_diff(
+        args["<base_csv>"],
+        args["<updated_csv>"],
+        args["--dry-run"],
+        args["--batch-size"],
+        args["--workers"],
+    )
 
 
 if __name__ == "__main__":
@@ -1,5 +1,7 @@
 #!/usr/bin/env python
 
+from functools import cached_property
+
 import pandas as pd
 
 
@@ -14,12 +16,13 @@ class DataFrameSetup:
         wrong_index=None,
     ):
         self.source_data = source_data or {
-            "record_id": [1, 2, 2],
+            # Everything is a string, as it is when the tools read REDCap CSVs
+            "record_id": ["1", "2", "2"],
             "redcap_event_name": ["scr_arm_1", "scr_arm_1", "pre_arm_1"],
             "redcap_repeat_instrument": ["", "", ""],
             "field1": ["a", "b", "c"],
             "field2": ["d", "e", "f"],
-            "field3": [10, 20, 30],
+            "field3": ["10", "20", "30"],
         }
         self.source_index = source_index or ["record_id", "redcap_event_name"]
 
@@ -27,16 +30,26 @@ class DataFrameSetup:
             # Change at row 3 in field 1
             "field1": ["a", "b", "g"],
             # Change at row 2 in field 3
-            "field3": [10, 40, 30],
+            "field3": ["10", "40", "30"],
         }
 
         self.wrong_index = wrong_index or ["record_id", "field2"]
 
-        # Call methods to create dataframes
+        # Call methods to create dataframes; the derived ones are only built
+        # when a test asks for them
         self.source_df = self._create_df()
-        self.diff_df = self._create_diff_df()
-        self.wrong_index_df = self._create_wrong_index_df()
-        self.extra_columns_df = self._add_extra_columns(self._copy_df(self.diff_df))
+
+    @cached_property
+    def diff_df(self):
+        return self._create_diff_df()
+
+    @cached_property
+    def wrong_index_df(self):
+        return self._create_wrong_index_df()
+
+    @cached_property
+    def extra_columns_df(self):
+        return self._add_extra_columns(self.diff_df)
 
     # Methods for creating dataframes
     def _create_df(self):
@@ -51,23 +64,23 @@ class DataFrameSetup:
             return target_df.copy()
 
     def _create_diff_df(self):
-        """Make the changes in the dataframe"""
-        target_df = self.source_df.copy().reset_index()
-        target_df.update(self.diff_data)
-        target_df.set_index(self.source_index, inplace=True)
-        return target_df
+        """Make the changes in the dataframe, straight from the source data"""
+        return pd.DataFrame(self.source_data | self.diff_data).set_index(
+            self.source_index
+        )
 
     def _create_wrong_index_df(self, target_df=None):
         """Make dataframe with wrong index"""
         if target_df is None:
-            target_df = self.source_df.copy().reset_index()
-        else:
-            target_df = target_df.copy().reset_index()
-        return target_df.set_index(self.wrong_index)
+            # Index the source data directly rather than undoing source_df's index
+            return pd.DataFrame(self.source_data).set_index(self.wrong_index)
+        return target_df.reset_index().set_index(self.wrong_index)
 
     def _add_extra_columns(self, target_df=None):
-        """Add extra columns to dataframe"""
+        """
+        Add extra columns to dataframe. Uses assign(), which returns a new frame
+        without copying or touching target_df, so there's no need to copy first.
+        """
         if target_df is None:
-            return self.source_df.copy().assign(field4=["x", "y", "z"])
-        else:
-            return target_df.copy().assign(field4=["x", "y", "z"])
+            target_df = self.source_df
+        return target_df.assign(field4=["x", "y", "z"])
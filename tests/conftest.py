@@ -0,0 +1,21 @@
+#!/usr/bin/env python
+
+import os
+
+import pytest
+
+from tests.DataFrameSetup import DataFrameSetup
+
+# The command-line modules read these at import, before any test runs;
+# redcap.Project() only checks their format, so dummy values are enough
+os.environ.setdefault("REDCAP_API_URL", "https://redcap.example.edu/api/")
+os.environ.setdefault("REDCAP_API_TOKEN", "0" * 32)
+
+
+@pytest.fixture(scope="session")
+def dataframe_setup():
+    """
+    A default DataFrameSetup, built once per session and shared by every test module.
+    Its frames are shared too, so tests must copy a frame before changing it.
+    """
+    return DataFrameSetup()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+
+import os
+import stat
+from contextlib import ExitStack
+from unittest.mock import MagicMock, patch
+
+import pytest
+from redcap import RedcapError
+
+from src.redcap_toolbox.download_redcap import (
+    PROJ,
+    download_redcap,
+    export_records_payload,
+)
+
+
+@pytest.fixture
+def pycap_payload():
+    """
+    Returns a function that gives the payload PROJ.export_records would POST,
+    for a project whose record ID field is record_id.
+
+    This is the one place the tests rely on PyCap internals: its private
+    metadata attributes are set so PROJ never asks REDCap for them, and
+    _call_api is patched to capture the payload instead of sending it.
+    """
+    metadata = {
+        "_def_field": "record_id",
+        "_field_names": ["record_id", "age"],
+        "_forms": ["demographics"],
+    }
+    with ExitStack() as stack:
+        for name, value in metadata.items():
+            stack.enter_context(patch.object(PROJ, name, value))
+        mock_call = stack.enter_context(
+            patch.object(PROJ, "_call_api", return_value="")
+        )
+
+        def payload(**kwargs):
+            PROJ.export_records(format_type="csv", **kwargs)
+            return mock_call.call_args.args[0]
+
+        yield payload
+
+
+def mock_response(chunks):
+    response = MagicMock()
+    response.__enter__.return_value = response
+    response.iter_content.return_value = iter(chunks)
+    return response
+
+
+@pytest.mark.parametrize("export_survey_fields", [False, True])
+def test_export_records_payload_matches_pycap_with_forms(
+    pycap_payload, export_survey_fields
+):
+    """
+    Tests that with --forms we send what PyCap would, including the record ID
+    and form_complete fields it backfills.
+    """
+    forms = ["demographics", "visit"]
+    expected = pycap_payload(forms=forms, export_survey_fields=export_survey_fields)
+    payload = export_records_payload(forms, export_survey_fields)
+
+    assert payload == expected
+    assert payload["fields[2]"] == "record_id"
+
+
+def test_export_records_payload_matches_pycap_without_forms(pycap_payload):
+    """
+    Tests that without --forms we send what PyCap would, minus its explicit list
+    of every field; REDCap exports all fields when none are requested.
+    """
+    expected = {k: v for k, v in pycap_payload().items() if not k.startswith("fields[")}
+    assert export_records_payload(None, False) == expected
+
+
+@patch("src.redcap_toolbox.download_redcap.requests.post")
+def test_download_redcap_streams_to_file(mock_post, tmp_path):
+    """
+    Tests that the response is written to the output file chunk by chunk, with
+    no temporary file left behind.
+    """
+    mock_post.return_value = mock_response([b"record_id,age\n", b"1,30\n", b"2,40\n"])
+    out_file = tmp_path / "out.csv"
+
+    download_redcap(out_file, None, False)
+
+    assert out_file.read_bytes() == b"record_id,age\n1,30\n2,40\n"
+    assert list(tmp_path.iterdir()) == [out_file]
+    assert mock_post.call_args.kwargs["stream"] is True
+    assert mock_post.call_args.kwargs["timeout"]
+
+
+@patch("src.redcap_toolbox.download_redcap.requests.post")
+def test_download_redcap_error_body(mock_post, tmp_path):
+    """
+    Tests that an "ERROR:" response is raised like PyCap does, and the existing
+    output file is left alone.
+    """
+    mock_post.return_value = mock_response([b"ERROR: The token is invalid\n"])
+    out_file = tmp_path / "out.csv"
+    out_file.write_text("old data\n")
+
+    with pytest.raises(RedcapError, match="The token is invalid"):
+        download_redcap(out_file, None, False)
+
+    assert out_file.read_text() == "old data\n"
+    assert list(tmp_path.iterdir()) == [out_file]
+
+
+@patch("src.redcap_toolbox.download_redcap.requests.post")
+def test_download_redcap_interrupted(mock_post, tmp_path):
+    """
+    Tests that a download that dies partway through leaves neither a truncated
+    output file nor a temporary file.
+    """
+
+    def broken_stream():
+        yield b"record_id,age\n"
+        raise RedcapError("Connection reset")
+
+    mock_post.return_value = mock_response(broken_stream())
+    out_file = tmp_path / "out.csv"
+
+    with pytest.raises(RedcapError, match="Connection reset"):
+        download_redcap(out_file, None, False)
+
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.fixture
+def umask_022():
+    old_umask = os.umask(0o022)
+    yield
+    os.umask(old_umask)
+
+
+@patch("src.redcap_toolbox.download_redcap.requests.post")
+def test_download_redcap_new_file_mode(mock_post, tmp_path, umask_022):
+    """
+    Tests that a new output file gets the umask's default permissions, like a
+    plain open() would give it, rather than the temporary file's 0600.
+    """
+    mock_post.return_value = mock_response([b"record_id\n1\n"])
+    out_file = tmp_path / "out.csv"
+
+    download_redcap(out_file, None, False)
+
+    assert stat.S_IMODE(out_file.stat().st_mode) == 0o644
+
+
+@patch("src.redcap_toolbox.download_redcap.requests.post")
+def test_download_redcap_keeps_existing_mode(mock_post, tmp_path, umask_022):
+    """
+    Tests that overwriting an output file keeps its permissions.
+    """
+    mock_post.return_value = mock_response([b"record_id\n1\n"])
+    out_file = tmp_path / "out.csv"
+    out_file.write_text("old data\n")
+    out_file.chmod(0o640)
+
+    download_redcap(out_file, None, False)
+
+    assert out_file.read_text() == "record_id\n1\n"
+    assert stat.S_IMODE(out_file.stat().st_mode) == 0o640
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+from redcap import RedcapError
+
+from src.redcap_toolbox.download_redcap_report import (
+    download_redcap_report,
+    main,
+)
+
+
+def fake_report(report_id, format_type):
+    if report_id == "missing":
+        # What PyCap raises when REDCap answers with an "ERROR:" body
+        raise RedcapError("ERROR: The value of the parameter report_id is not valid")
+    return f"record_id,report\n1,{report_id}\n"
+
+
+@patch("src.redcap_toolbox.download_redcap_report.PROJ")
+def test_download_redcap_report_writes_every_report(mock_proj, tmp_path):
+    """
+    Tests that each report ID is downloaded to its own file.
+    """
+    mock_proj.export_report.side_effect = fake_report
+    report_ids = [str(i) for i in range(10)]
+
+    download_redcap_report(report_ids, tmp_path, "test", False, max_workers=3)
+
+    assert mock_proj.export_report.call_count == 10
+    for rep_id in report_ids:
+        out_file = tmp_path / f"test__report_{rep_id}.csv"
+        assert out_file.read_text() == f"record_id,report\n1,{rep_id}\n"
+
+
+@patch("src.redcap_toolbox.download_redcap_report.PROJ")
+def test_download_redcap_report_skips_failed_report(mock_proj, tmp_path, caplog):
+    """
+    Tests that a report that fails to download is logged and skipped, and the
+    others still complete.
+    """
+    mock_proj.export_report.side_effect = fake_report
+
+    download_redcap_report(["1", "missing", "2"], tmp_path, "test", False)
+
+    assert "Report missing not found! Skipping ..." in caplog.text
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "test__report_1.csv",
+        "test__report_2.csv",
+    ]
+
+
+@patch(
+    "src.redcap_toolbox.download_redcap_report.ThreadPoolExecutor",
+    wraps=ThreadPoolExecutor,
+)
+@patch("src.redcap_toolbox.download_redcap_report.PROJ")
+@patch("src.redcap_toolbox.download_redcap_report.docopt")
+def test_main_passes_workers(mock_docopt, mock_proj, mock_executor, tmp_path):
+    """
+    Tests that --workers sets the size of the download thread pool.
+    """
+    id_file = tmp_path / "ids.txt"
+    id_file.write_text("1\n2\n")
+    mock_docopt.return_value = {
+        "<output_dir>": str(tmp_path),
+        "--debug": False,
+        "--file": str(id_file),
+        "--id": None,
+        "--prefix": "test",
+        "--workers": "3",
+    }
+    mock_proj.export_report.side_effect = fake_report
+
+    main()
+
+    mock_executor.assert_called_once_with(max_workers=3)
+    assert (tmp_path / "test__report_2.csv").exists()
+
+
+@pytest.mark.parametrize("workers", [0, "-1", "abc"])
+@patch("src.redcap_toolbox.download_redcap_report.PROJ")
+def test_download_redcap_report_rejects_bad_workers(mock_proj, tmp_path, workers):
+    """
+    Tests that a worker count that isn't a positive integer fails up front.
+    """
+    with pytest.raises(ValueError, match="Number of workers must be a positive"):
+        download_redcap_report(["1"], tmp_path, "test", False, max_workers=workers)
+    mock_proj.export_report.assert_not_called()
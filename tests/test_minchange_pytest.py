@@ -1,63 +1,48 @@
 #!/usr/bin/env python
 
+import json
+
 import pytest
 
-from src.redcap_toolbox.minchange import transformation_dicts
+from src.redcap_toolbox.minchange import (
+    iter_transformation_dicts,
+    transformation_dicts,
+)
 from tests.DataFrameSetup import DataFrameSetup
 
 
-@pytest.fixture
-def setup_df():
-    """
-    Fixture that sets up the dict of data frames for testing. Uses default values from
-    DataFrameSetup.
-    """
-    df = DataFrameSetup()
-    source_df = df.source_df
-    wrong_index_df = df.wrong_index_df
-    extra_columns_df = df.extra_columns_df
-    diff_df = df.diff_df
-
-    return {
-        "source_df": source_df,
-        "diff_df": diff_df,
-        "wrong_index_df": wrong_index_df,
-        "extra_columns_df": extra_columns_df,
-    }
-
-
-def test_transformation_dicts_no_changes(setup_df):
+def test_transformation_dicts_no_changes(dataframe_setup):
     """
     Test when there are no differences between source and target.
     ."""
-    source_df = setup_df["source_df"]
-    copy_df = setup_df["source_df"].copy()
+    source_df = dataframe_setup.source_df
+    copy_df = dataframe_setup.source_df.copy()
 
     result = transformation_dicts(source_df, copy_df)
     assert result == []
 
 
-def test_transformation_dicts_with_changes(setup_df):
+def test_transformation_dicts_with_changes(dataframe_setup):
     """
     Test when there are differences between source and target.
     """
-    source_df = setup_df["source_df"]
-    diff_df = setup_df["diff_df"]
+    source_df = dataframe_setup.source_df
+    diff_df = dataframe_setup.diff_df
 
     result = transformation_dicts(source_df, diff_df)
     expected = [
-        {"record_id": 2, "redcap_event_name": "scr_arm_1", "field3": 40},
-        {"record_id": 2, "redcap_event_name": "pre_arm_1", "field1": "g"},
+        {"record_id": "2", "redcap_event_name": "scr_arm_1", "field3": "40"},
+        {"record_id": "2", "redcap_event_name": "pre_arm_1", "field1": "g"},
     ]
     assert result == expected
 
 
-def test_transformation_dicts_different_indexes(setup_df):
+def test_transformation_dicts_different_indexes(dataframe_setup):
     """
     Test when source and target DataFrames have different indexes.
     """
-    source_df = setup_df["source_df"]
-    wrong_index_df = setup_df["wrong_index_df"]
+    source_df = dataframe_setup.source_df
+    wrong_index_df = dataframe_setup.wrong_index_df
 
     with pytest.raises(
         ValueError, match="Source and target dfs have different indexes"
@@ -65,14 +50,76 @@ def test_transformation_dicts_different_indexes(setup_df):
         transformation_dicts(source_df, wrong_index_df)
 
 
-def test_transformation_dicts_different_columns(setup_df):
+def test_transformation_dicts_different_columns(dataframe_setup):
     """
     Test when source and target DataFrames have different columns.
     """
-    source_df = setup_df["source_df"]
-    extra_columns_df = setup_df["extra_columns_df"]
+    source_df = dataframe_setup.source_df
+    extra_columns_df = dataframe_setup.extra_columns_df
 
     with pytest.raises(
         ValueError, match="Source and target dfs have different columns"
     ):
         transformation_dicts(source_df, extra_columns_df)
+
+
+def test_transformation_dicts_single_index():
+    """
+    Test when source and target DataFrames have a single-level index, as in
+    projects without events.
+    """
+    df = DataFrameSetup(
+        source_data={"record_id": ["1", "2", "3"], "field1": ["a", "b", "c"]},
+        source_index=["record_id"],
+        diff_data={"field1": ["a", "x", "c"]},
+        wrong_index=["field1"],
+    )
+
+    result = transformation_dicts(df.source_df, df.diff_df)
+    assert result == [{"record_id": "2", "field1": "x"}]
+
+
+def test_iter_transformation_dicts_matches_list(dataframe_setup):
+    """
+    Test that the lazy version yields the same dicts as transformation_dicts.
+    """
+    source_df = dataframe_setup.source_df
+    diff_df = dataframe_setup.diff_df
+
+    result = iter_transformation_dicts(source_df, diff_df)
+    assert not isinstance(result, list)
+    assert list(result) == transformation_dicts(source_df, diff_df)
+
+
+def test_transformation_dicts_integer_index_is_json_safe():
+    """
+    Test that integer index values come back as plain ints, since PyCap's
+    import_records sends the dicts through json.dumps.
+    """
+    df = DataFrameSetup(
+        source_data={
+            "record_id": [1, 2],
+            "redcap_event_name": ["scr_arm_1", "scr_arm_1"],
+            "field1": ["a", "b"],
+        },
+        diff_data={"field1": ["a", "c"]},
+    )
+
+    result = transformation_dicts(df.source_df, df.diff_df)
+    assert result == [{"record_id": 2, "redcap_event_name": "scr_arm_1", "field1": "c"}]
+    assert type(result[0]["record_id"]) is int
+    json.dumps(result)
+
+
+def test_iter_transformation_dicts_different_indexes(dataframe_setup):
+    """
+    Test that the lazy version rejects mismatched frames when called, not when
+    first iterated.
+    """
+    source_df = dataframe_setup.source_df
+    wrong_index_df = dataframe_setup.wrong_index_df
+
+    with pytest.raises(
+        ValueError, match="Source and target dfs have different indexes"
+    ):
+        iter_transformation_dicts(source_df, wrong_index_df)
@@ -30,21 +30,12 @@ def event_df():
 
 
 @pytest.fixture
-def df():
+def instance_data(dataframe_setup: DataFrameSetup):
     """
-    This fixture provides the base `DataFrameSetup` instance and
-    is used across several tests.
-    """
-    return DataFrameSetup()
-
-
-@pytest.fixture
-def instance_data(df: DataFrameSetup):
-    """
-    Depends on df fixture and updates the redcap_repeat_instrument column
+    Depends on dataframe_setup fixture and updates the redcap_repeat_instrument column
     for specific cases.
     """
-    data = df.source_df.copy().reset_index()
+    data = dataframe_setup.source_df.copy().reset_index()
     data.update({"redcap_repeat_instrument": ["", "", "meds"]})
     return data
 
@@ -53,12 +44,12 @@ def instance_data(df: DataFrameSetup):
 @patch("src.redcap_toolbox.split_redcap_data.pd.read_csv")
 def split_data_setup(
     mock_read_csv,
-    df: DataFrameSetup,
+    dataframe_setup: DataFrameSetup,
     event_df: pd.DataFrame,
     instance_data: pd.DataFrame,
 ):
     # Mock dataset and event map
-    data = instance_data.set_index(df.source_index)
+    data = instance_data.set_index(dataframe_setup.source_index)
 
     event_df.set_index("redcap_event", inplace=True)
     mock_read_csv.return_value = event_df
@@ -68,11 +59,11 @@ def split_data_setup(
 
 
 @pytest.fixture
-def condense_df_setup(df: DataFrameSetup):
+def condense_df_setup(dataframe_setup: DataFrameSetup):
     # Mock dataset
-    data = df.source_df.copy().reset_index()
+    data = dataframe_setup.source_df.copy().reset_index()
     data.update({"redcap_event_name": ["scr", "scr", "pre"], "field2": ["", "", ""]})
-    data = data.set_index(df.source_index)
+    data = data.set_index(dataframe_setup.source_index)
     return data
 
 
@@ -101,22 +92,21 @@ def test_make_event_map_no_file():
     assert result == {}
 
 
-def test_combine_names_with_event_and_rep_name():
-    """
-    Tests the combine_name call which is used to make file names uniquely when
-    provided with both event name and repeat instrument name.
-    """
-    result = combine_names("scr", "meds")
-    assert result == "scr__meds"
-
-
-def test_combine_names_with_empty_rep_name():
+@pytest.mark.parametrize(
+    "event_name,rep_name,expected",
+    [
+        ("scr", "meds", "scr__meds"),
+        ("scr", "", "scr"),
+        ("", "meds", "meds"),
+        ("", "", ""),
+    ],
+)
+def test_combine_names(event_name, rep_name, expected):
     """
-    Tests the combine_name call which is used to make file names uniquely when
-    provided with only the event name.
+    Tests the combine_name call which is used to make file names uniquely from
+    the event name and repeat instrument name, either of which may be empty.
     """
-    result = combine_names("scr", "")
-    assert result == "scr"
+    assert combine_names(event_name, rep_name) == expected
 
 
 def test_split_data(split_data_setup):
@@ -149,6 +139,17 @@ def test_condense_df(condense_df_setup):
     assert "field1" in result.columns
 
 
+def test_condense_df_drops_empty_rows(condense_df_setup):
+    """
+    Tests that condense_df drops rows with no data outside the reserved columns.
+    """
+    data = condense_df_setup.assign(field1=["a", "", "c"], field3=["10", "", "30"])
+    result = condense_df(data)
+
+    assert result.shape == (2, 2)
+    assert list(result["field1"]) == ["a", "c"]
+
+
 @patch("src.redcap_toolbox.split_redcap_data.pd.read_csv")
 @patch("src.redcap_toolbox.split_redcap_data.pd.DataFrame.to_csv")
 @patch("src.redcap_toolbox.split_redcap_data.make_event_map")
@@ -156,7 +157,6 @@ def test_split_redcap_data(
     mock_make_event_map,
     mock_to_csv,
     mock_read_csv,
-    df: DataFrameSetup,
     event_df: pd.DataFrame,
     instance_data: pd.DataFrame,
     split_data_setup,
@@ -186,3 +186,97 @@ def test_split_redcap_data(
         Path("mock_output_dir") / "test_prefix__pre__meds.csv", index=False
     )
     assert mock_to_csv.call_count == 2
+
+
+@patch("src.redcap_toolbox.split_redcap_data.pd.read_csv")
+@patch("src.redcap_toolbox.split_redcap_data.parquet_engine_available")
+@patch("src.redcap_toolbox.split_redcap_data.pd.DataFrame.to_parquet")
+@patch("src.redcap_toolbox.split_redcap_data.pd.DataFrame.to_csv")
+@patch("src.redcap_toolbox.split_redcap_data.make_event_map")
+def test_split_redcap_data_both_formats(
+    mock_make_event_map,
+    mock_to_csv,
+    mock_to_parquet,
+    mock_engine_available,
+    mock_read_csv,
+    split_data_setup,
+):
+    """
+    Tests that output_format="both" writes a CSV and a Parquet file for each split.
+    """
+    data, event_map = split_data_setup
+    data.reset_index(inplace=True)
+    mock_read_csv.return_value = data
+    mock_make_event_map.return_value = event_map
+    mock_engine_available.return_value = True
+
+    split_redcap_data(
+        "mock_input.csv",
+        "mock_output_dir",
+        prefix="test_prefix",
+        mapping_file="mock_mapping_file.csv",
+        condense=False,
+        output_format="both",
+    )
+
+    mock_to_csv.assert_any_call(
+        Path("mock_output_dir") / "test_prefix__scr.csv", index=False
+    )
+    mock_to_parquet.assert_any_call(
+        Path("mock_output_dir") / "test_prefix__pre__meds.parquet",
+        compression="snappy",
+        index=False,
+    )
+    assert mock_to_csv.call_count == 2
+    assert mock_to_parquet.call_count == 2
+
+
+def test_split_redcap_data_unknown_format():
+    """
+    Tests that an unknown output format is rejected before any data is read.
+    """
+    with pytest.raises(ValueError, match="Unknown output format"):
+        split_redcap_data("mock_input.csv", "mock_output_dir", output_format="xlsx")
+
+
+@pytest.mark.parametrize("output_format", ["parquet", "both"])
+@patch("src.redcap_toolbox.split_redcap_data.parquet_engine_available")
+@patch("src.redcap_toolbox.split_redcap_data.pd.read_csv")
+def test_split_redcap_data_no_parquet_engine(
+    mock_read_csv, mock_engine_available, output_format
+):
+    """
+    Tests that Parquet output without an engine installed fails before any data
+    is read, and says how to install one.
+    """
+    mock_engine_available.return_value = False
+    with pytest.raises(ImportError, match=r"redcap-toolbox\[parquet\]"):
+        split_redcap_data(
+            "mock_input.csv", "mock_output_dir", output_format=output_format
+        )
+    mock_read_csv.assert_not_called()
+
+
+def test_split_redcap_data_skips_empty_split(tmp_path):
+    """
+    Tests that with condensing on, a split with no data outside the reserved
+    columns isn't written, rather than written as a file with no columns.
+    """
+    input_file = tmp_path / "input.csv"
+    pd.DataFrame(
+        {
+            "record_id": ["1", "1", "2"],
+            "redcap_event_name": ["scr_arm_1", "fu_arm_1", "fu_arm_1"],
+            "field1": ["a", "", ""],
+        }
+    ).to_csv(input_file, index=False)
+
+    split_redcap_data(input_file, tmp_path)
+
+    assert (tmp_path / "redcap__scr_arm_1.csv").exists()
+    assert not (tmp_path / "redcap__fu_arm_1.csv").exists()
+
+    split_redcap_data(input_file, tmp_path, condense=False)
+
+    fu_df = pd.read_csv(tmp_path / "redcap__fu_arm_1.csv", dtype=str)
+    assert list(fu_df["record_id"]) == ["1", "2"]
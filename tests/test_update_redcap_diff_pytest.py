@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+
+import logging
+import threading
+import time
+from types import MappingProxyType
+from unittest.mock import MagicMock
+
+import pandas as pd
+import pytest
+from requests import RequestException
+
+from src.redcap_toolbox.update_redcap_diff import (
+    chunks,
+    main,
+    update_redcap_diff,
+)
+
+# Built once; csv_files hands out copies, so tests can't change them
+DATA = {
+    "record_id": ["1", "2", "3", "4", "5"],
+    "redcap_event_name": ["scr_arm_1"] * 5,
+    "field1": ["a"] * 5,
+}
+FRAMES = {
+    "base.csv": pd.DataFrame(DATA),
+    "updated.csv": pd.DataFrame(DATA | {"field1": ["b"] * 5}),
+}
+
+# What docopt gives main() for "update_redcap_diff.py base.csv updated.csv"
+DOCOPT_ARGS = MappingProxyType(
+    {
+        "<base_csv>": "base.csv",
+        "<updated_csv>": "updated.csv",
+        "--dry-run": False,
+        "--batch-size": "500",
+        "--workers": "4",
+        "--verbose": False,
+    }
+)
+
+
+@pytest.fixture
+def csv_files(monkeypatch):
+    """
+    Serves a base and an updated frame, where each of the five records has one
+    change, to update_redcap_diff's read_csv by filename, so no files are written.
+    """
+    monkeypatch.setattr(
+        "src.redcap_toolbox.update_redcap_diff.pd.read_csv",
+        lambda path, **kwargs: FRAMES[path].copy(),
+    )
+    return "base.csv", "updated.csv"
+
+
+def record_ids(batch):
+    return [d["record_id"] for d in batch]
+
+
+class ProjStub:
+    """
+    Stands in for PROJ: records every batch passed to import_records and
+    answers with import_result(batch), which tests can swap out.
+    """
+
+    def __init__(self):
+        self.calls = []
+        self.import_result = record_ids
+
+    def import_records(self, batch):
+        self.calls.append(batch)
+        return self.import_result(batch)
+
+
+@pytest.fixture(autouse=True)
+def mock_proj(monkeypatch):
+    """
+    Replaces PROJ with a ProjStub in every test, so nothing is sent to REDCap.
+    """
+    stub = ProjStub()
+    monkeypatch.setattr("src.redcap_toolbox.update_redcap_diff.PROJ", stub)
+    return stub
+
+
+@pytest.fixture
+def mock_docopt(monkeypatch):
+    mock = MagicMock()
+    monkeypatch.setattr("src.redcap_toolbox.update_redcap_diff.docopt.docopt", mock)
+    return mock
+
+
+@pytest.fixture
+def mock_update(monkeypatch):
+    mock = MagicMock()
+    monkeypatch.setattr(
+        "src.redcap_toolbox.update_redcap_diff.update_redcap_diff", mock
+    )
+    return mock
+
+
+def test_chunks_splits_into_batches():
+    """
+    Tests that chunks yields full batches followed by the remainder.
+    """
+    assert list(chunks(range(5), 2)) == [[0, 1], [2, 3], [4]]
+
+
+def test_update_redcap_diff_imports_in_batches(mock_proj, csv_files):
+    """
+    Tests that every changed record is imported, batch_size records at a time.
+    """
+    update_redcap_diff(*csv_files, dry_run=False, batch_size=2, max_workers=1)
+
+    batches = mock_proj.calls
+    assert [record_ids(b) for b in batches] == [["1", "2"], ["3", "4"], ["5"]]
+    assert batches[0][0] == {
+        "record_id": "1",
+        "redcap_event_name": "scr_arm_1",
+        "field1": "b",
+    }
+
+
+def test_update_redcap_diff_caps_imports_in_flight(mock_proj, csv_files):
+    """
+    Tests that no more than max_workers imports ever run at the same time.
+    """
+    lock = threading.Lock()
+    running = []
+    peak = []
+
+    def slow_import(batch):
+        with lock:
+            running.append(batch)
+            peak.append(len(running))
+        time.sleep(0.02)
+        with lock:
+            running.remove(batch)
+        return record_ids(batch)
+
+    mock_proj.import_result = slow_import
+    update_redcap_diff(*csv_files, dry_run=False, batch_size=1, max_workers=2)
+
+    assert len(mock_proj.calls) == 5
+    assert max(peak) <= 2
+
+
+def test_update_redcap_diff_dry_run_counts(mock_proj, csv_files, caplog):
+    """
+    Tests that a dry run reports record and batch counts without importing.
+    """
+    update_redcap_diff(*csv_files, dry_run=True, batch_size=2)
+
+    assert mock_proj.calls == []
+    assert "Would have imported 5 records in 3 batches" in caplog.text
+
+
+def test_update_redcap_diff_dry_run_lists_diffs(csv_files, caplog):
+    """
+    Tests that a verbose dry run logs every change, not just the first.
+    """
+    caplog.set_level(logging.DEBUG, logger="src.redcap_toolbox.update_redcap_diff")
+    update_redcap_diff(*csv_files, dry_run=True)
+
+    diff_lines = [r.getMessage() for r in caplog.records if r.msg == "Diff: %s"]
+    assert len(diff_lines) == 5
+    assert "'record_id': '5'" in diff_lines[-1]
+
+
+def test_update_redcap_diff_failed_batch(mock_proj, csv_files, caplog):
+    """
+    Tests that a failed batch is re-raised, new batches stop, and the results of
+    batches that did go through are still logged.
+    """
+
+    def fail_on_record_2(batch):
+        if "2" in record_ids(batch):
+            raise RequestException("ERROR: bad record")
+        time.sleep(0.05)
+        return record_ids(batch)
+
+    mock_proj.import_result = fail_on_record_2
+    with pytest.raises(RequestException, match="bad record"):
+        update_redcap_diff(*csv_files, dry_run=False, batch_size=1, max_workers=2)
+
+    assert "Import record result: ['1']" in caplog.text
+    assert "Import failed: ERROR: bad record" in caplog.text
+    # Batch 2 fails while batch 1 is still running, so batch 3 is never sent
+    assert len(mock_proj.calls) == 2
+
+
+@pytest.mark.parametrize(
+    "options,message",
+    [
+        ({"batch_size": 0}, "Batch size"),
+        ({"batch_size": -3}, "Batch size"),
+        ({"batch_size": "ten"}, "Batch size"),
+        ({"max_workers": 0}, "Number of workers"),
+    ],
+)
+def test_update_redcap_diff_rejects_bad_batch_options(
+    mock_proj, csv_files, options, message
+):
+    """
+    Tests that batch sizes and worker counts that aren't positive integers fail
+    instead of silently doing nothing.
+    """
+    for dry_run in (True, False):
+        with pytest.raises(ValueError, match=f"{message} must be a positive integer"):
+            update_redcap_diff(*csv_files, dry_run=dry_run, **options)
+    assert mock_proj.calls == []
+
+
+def test_main_parses_batch_options(mock_docopt, mock_update):
+    """
+    Tests that main passes --batch-size and --workers on to update_redcap_diff.
+    """
+    mock_docopt.return_value = DOCOPT_ARGS | {"--batch-size": "100", "--workers": "2"}
+    main()
+    mock_update.assert_called_once_with("base.csv", "updated.csv", False, "100", "2")
+
+
+@pytest.mark.parametrize(
+    "option,value,message",
+    [
+        ("--batch-size", "0", "Batch size"),
+        ("--batch-size", "ten", "Batch size"),
+        ("--workers", "-1", "Number of workers"),
+    ],
+)
+def test_main_rejects_bad_batch_options(
+    mock_proj, mock_docopt, csv_files, option, value, message
+):
+    """
+    Tests that main rejects batch sizes and worker counts that aren't positive.
+    """
+    mock_docopt.return_value = DOCOPT_ARGS | {option: value}
+    with pytest.raises(ValueError, match=f"{message} must be a positive integer"):
+        main()
+    assert mock_proj.calls == []